@@ -1,15 +1,23 @@
 import asyncio
+import hashlib
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator, Mapping, Optional, Set, Tuple
 from rich.console import Console
 from rich.progress import Progress
 from rich.table import Table
 import aiohttp
-import inquirer
+import orjson
 import argparse
 
+try:
+    import aiodns  # noqa: F401
+    from aiohttp.resolver import AsyncResolver
+except ImportError:
+    AsyncResolver = None
+
 logging.basicConfig(
     format='%(asctime)s - %(message)s',
     level=logging.INFO,
@@ -19,49 +27,249 @@ logging.basicConfig(
 
 console = Console()
 
+PR_SUMMARY_FRAGMENT = '''
+fragment PRSummary on PullRequest {
+  number
+  reviews(first: 100) { nodes { state comments { totalCount } } }
+  commits { totalCount }
+  files(first: 100) { totalCount nodes { path } }
+}
+'''
+
+PR_COLUMNS = [
+    'PR #',
+    'Title',
+    'Days Open',
+    'Files Changed',
+    'Commits',
+    'File Types',
+    'Comments',
+]
+
+
+def normalize_status(status: str) -> str:
+    return status.strip().upper().replace('_', ' ')
+
 
 class GitHubPRClient:
-    def __init__(self, token: str, repo_owner: str, repo_name: str):
+    def __init__(self, token: str, repo_owner: str, repo_name: str, cache_dir: str = None):
         self.headers = {
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json',
+            'Accept-Encoding': 'gzip',
         }
         self.base_url = 'https://api.github.com'
+        self.graphql_url = f'{self.base_url}/graphql'
+        self.graphql_chunk_size = 25
         self.repo_owner = repo_owner
         self.repo_name = repo_name
+        self.cache_dir = cache_dir or os.path.join(
+            os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'gh-pr'
+        )
         self.session = None
+        self._pulls_cache = None
+        self._sem = asyncio.Semaphore(8)
+        self.rate_limit_threshold = 10
+        # REST ('core') and GraphQL have separate budgets, keyed by X-RateLimit-Resource
+        self._rate_limit_reset: Dict[str, float] = {}
+        self.max_retries = 3
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        resolver = None
+        if AsyncResolver:
+            try:
+                resolver = AsyncResolver()
+            except RuntimeError as e:
+                # e.g. aiodns refuses Windows' default Proactor event loop
+                logging.debug(f"Falling back to the threaded DNS resolver: {e}")
+        connector = aiohttp.TCPConnector(
+            limit=32,
+            limit_per_host=16,
+            resolver=resolver,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+        )
+        timeout = aiohttp.ClientTimeout(total=30, connect=5)
+        self.session = aiohttp.ClientSession(
+            headers=self.headers, connector=connector, timeout=timeout
+        )
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
 
+    def _record_rate_limit(self, headers: Mapping[str, str]):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_ts = headers.get('X-RateLimit-Reset')
+        if remaining is None or reset_ts is None:
+            return
+        if int(remaining) < self.rate_limit_threshold:
+            resource = headers.get('X-RateLimit-Resource', 'core')
+            self._rate_limit_reset[resource] = max(
+                self._rate_limit_reset.get(resource, 0.0), int(reset_ts)
+            )
+
+    async def _wait_for_rate_limit(self, resource: str):
+        delay = self._rate_limit_reset.get(resource, 0.0) - time.time()
+        if delay > 0:
+            logging.info(f"Rate limit for {resource} nearly exhausted, sleeping {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, response: aiohttp.ClientResponse) -> Optional[float]:
+        if response.status not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return None
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            reset_ts = int(response.headers.get('X-RateLimit-Reset', 0))
+            return max(0, reset_ts - time.time())
+        return None
+
+    def _cache_path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _load_cached(self, url: str) -> Dict[str, Any]:
+        try:
+            with open(self._cache_path(url), 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+    def _store_cached(self, url: str, etag: str, body: Any):
+        path = self._cache_path(url)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            # Owner-only permissions: the cache may hold private repository data
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps({'etag': etag, 'body': body}))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Could not write response cache: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    async def _request(
+        self, method: str, url: str, resource: str, **kwargs: Any
+    ) -> Tuple[int, Mapping[str, str], bytes]:
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_rate_limit(resource)
+            async with self._sem:
+                async with self.session.request(method, url, **kwargs) as response:
+                    self._record_rate_limit(response.headers)
+                    delay = self._retry_delay(response)
+                    if delay is None or attempt == self.max_retries:
+                        response.raise_for_status()
+                        return response.status, response.headers, await response.read()
+            # Sleep outside the semaphore so other requests keep their slots
+            logging.info(f"Rate limited, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
     async def _fetch(self, url: str) -> Dict[str, Any]:
-        async with self.session.get(url) as response:
-            response.raise_for_status()
-            return await response.json()
+        cached = self._load_cached(url)
+        if not isinstance(cached, dict) or 'etag' not in cached or 'body' not in cached:
+            cached = None
+        headers = {'If-None-Match': cached['etag']} if cached else None
+
+        status, response_headers, body = await self._request(
+            'GET', url, 'core', headers=headers
+        )
+        if cached and status == 304:
+            return cached['body']
+
+        data = orjson.loads(body)
+        etag = response_headers.get('ETag')
+        if etag:
+            self._store_cached(url, etag, data)
+        return data
+
+    async def _post(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        _, _, body = await self._request('POST', url, 'graphql', json=payload)
+        return orjson.loads(body)
+
+    async def _get_pulls(self) -> List[Dict[str, Any]]:
+        # Caching the task rather than its result lets concurrent callers share one request
+        if self._pulls_cache is None:
+            url = f'{self.base_url}/repos/{self.repo_owner}/{self.repo_name}/pulls'
+            self._pulls_cache = asyncio.create_task(self._fetch(url))
+        try:
+            return await asyncio.shield(self._pulls_cache)
+        except aiohttp.ClientError:
+            self._pulls_cache = None
+            raise
 
     async def get_all_users(self) -> List[str]:
-        url = f'{self.base_url}/repos/{self.repo_owner}/{self.repo_name}/pulls'
-        data = await self._fetch(url)
+        data = await self._get_pulls()
         return list(set(pr['user']['login'] for pr in data))
 
     async def get_user_pull_requests(self, user: str = None):
-        url = f'{self.base_url}/repos/{self.repo_owner}/{self.repo_name}/pulls'
-        data = await self._fetch(url)
+        data = await self._get_pulls()
         if user:
             return [pr for pr in data if pr['user']['login'] == user]
         return data
 
-    async def get_pr_details(self, pr_number: str) -> Dict[str, Any]:
-        base_url = f'{self.base_url}/repos/{self.repo_owner}/{self.repo_name}/pulls/{pr_number}'
-        endpoints = ['reviews', 'comments', 'commits', 'files']
-        tasks = [self._fetch(f'{base_url}/{endpoint}') for endpoint in endpoints]
-        results = await asyncio.gather(*tasks)
-        return dict(zip(endpoints, results))
+    async def _graphql_pr_summary_chunk(self, pr_numbers: List[int]) -> Dict[int, Dict[str, Any]]:
+        aliases = ' '.join(
+            f'pr{i}: pullRequest(number: {number}) {{ ...PRSummary }}'
+            for i, number in enumerate(pr_numbers)
+        )
+        query = (
+            'query($owner: String!, $name: String!) { '
+            f'repository(owner: $owner, name: $name) {{ {aliases} }} }}'
+            f'{PR_SUMMARY_FRAGMENT}'
+        )
+        payload = {
+            'query': query,
+            'variables': {'owner': self.repo_owner, 'name': self.repo_name},
+        }
+        data = await self._post(self.graphql_url, payload)
+        for error in data.get('errors') or []:
+            # A PR closed or deleted since the /pulls fetch comes back as a null alias
+            if error.get('type') == 'NOT_FOUND' and len(error.get('path') or []) == 2:
+                logging.info(f"Skipping PR: {error['message']}")
+                continue
+            raise aiohttp.ClientError(error['message'])
+
+        summaries = {}
+        for pr in data['data']['repository'].values():
+            if pr is None:
+                continue
+            reviews = pr['reviews']['nodes']
+            summaries[pr['number']] = {
+                'review_states': [review['state'] for review in reviews],
+                # Review comments on the diff, matching REST /pulls/{n}/comments
+                'comments': sum(review['comments']['totalCount'] for review in reviews),
+                'commits': pr['commits']['totalCount'],
+                'files_count': pr['files']['totalCount'],
+                'file_names': [f['path'] for f in pr['files']['nodes']],
+            }
+        return summaries
+
+    async def graphql_pr_summary(
+        self, pr_numbers: List[int]
+    ) -> AsyncIterator[Dict[int, Dict[str, Any]]]:
+        chunks = [
+            pr_numbers[i:i + self.graphql_chunk_size]
+            for i in range(0, len(pr_numbers), self.graphql_chunk_size)
+        ]
+        tasks = [asyncio.create_task(self._graphql_pr_summary_chunk(c)) for c in chunks]
+        try:
+            for next_chunk in asyncio.as_completed(tasks):
+                yield await next_chunk
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
 
 class InlinePRAnalyzer:
@@ -69,80 +277,82 @@ class InlinePRAnalyzer:
         self.client = client
         self.args = args
 
-    def process_pr(self, pr: Dict[str, Any], details: Dict[str, Any]) -> Dict[str, Any]:
-        # reviews = details['reviews']
-        comments = details['comments']
-        commits = details['commits']
-        files = details['files']
-
-        # approvers = [review['user']['login'] for review in reviews if review['state'].lower() == 'approved']
-        created_date = datetime.strptime(pr['created_at'], '%Y-%m-%dT%H:%M:%SZ')
-        date_diff = (datetime.now() - created_date).days
-        file_types = set(
-            f['filename'].split('.')[-1] if '.' in f['filename'] else 'no_ext' for f in files
+    def process_pr(
+        self,
+        pr: Dict[str, Any],
+        summary: Dict[str, Any],
+        now: datetime,
+        cols: Dict[str, List[Any]],
+    ):
+        # created_at is always '%Y-%m-%dT%H:%M:%SZ'; slicing avoids strptime's overhead
+        s = pr['created_at']
+        created_date = datetime(
+            int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19])
         )
-
-        return {
-            'PR #': pr['number'],
-            'Title': pr['title'],
-            'Days Open': date_diff,
-            'Files Changed': len(files),
-            'Commits': len(commits),
-            'File Types': ', '.join(sorted(file_types)),
-            'Comments': len(comments),
-            # 'Status': ('DRAFT' if pr['draft'] else ('READY' if approvers else 'PENDING REVIEW')),
-        }
+        date_diff = (now - created_date).days
+        file_types = set()
+        add_file_type = file_types.add
+        for fn in summary['file_names']:
+            _, sep, ext = fn.rpartition('.')
+            add_file_type(ext if sep else 'no_ext')
+
+        cols['PR #'].append(pr['number'])
+        cols['Title'].append(pr['title'])
+        cols['Days Open'].append(date_diff)
+        cols['Files Changed'].append(summary['files_count'])
+        cols['Commits'].append(summary['commits'])
+        cols['File Types'].append(', '.join(sorted(file_types)))
+        cols['Comments'].append(summary['comments'])
 
     async def get_user_selection(self) -> str:
         if self.args.user:
             return self.args.user
 
+        import inquirer
+
         users = await self.client.get_all_users()
         questions = [inquirer.List('user', message="Select user", choices=users, carousel=True)]
         answers = inquirer.prompt(questions)
         return answers['user'] if answers else ''
 
-    async def get_available_statuses(self) -> List[str]:
-        prs = await self.client.get_user_pull_requests()
-        statuses = {'ALL'}
-
-        for pr in prs:
-            if pr['draft']:
-                statuses.add('DRAFT')
-                continue
-
-            details = await self.client.get_pr_details(pr['number'])
-            reviews = details['reviews']
+    def get_pr_statuses(self, pr: Dict[str, Any], summary: Dict[str, Any]) -> Set[str]:
+        if pr['draft']:
+            return {'DRAFT'}
 
-            approvers = [
-                review['user']['login']
-                for review in reviews
-                if review['state'].lower() == 'approved'
-            ]
-            if approvers:
-                statuses.add('READY')
-            else:
-                statuses.add('PENDING REVIEW')
-
-            for review in reviews:
-                if review['state'].upper() not in ['APPROVED', 'COMMENTED']:
-                    statuses.add(review['state'].upper())
+        review_states = summary['review_states']
+        statuses = {'READY' if 'APPROVED' in review_states else 'PENDING REVIEW'}
+        statuses.update(
+            state for state in review_states if state not in ['APPROVED', 'COMMENTED']
+        )
+        return statuses
 
+    def get_available_statuses(self, pr_statuses: List[Set[str]]) -> List[str]:
+        statuses = {'ALL'}
+        for current in pr_statuses:
+            statuses.update(current)
         return sorted(list(statuses))
 
-    async def get_status_selection(self) -> List[str]:
+    def get_status_selection(self, pr_statuses: List[Set[str]]) -> List[str]:
         if self.args.status:
-            statuses = self.args.status.split(',')
+            available_statuses = self.get_available_statuses(pr_statuses)
+            # Accept 'pending_review', ' READY' etc. for the canonical status names
+            by_key = {normalize_status(status): status for status in available_statuses}
+            statuses = [
+                by_key.get(normalize_status(status), normalize_status(status))
+                for status in self.args.status.split(',')
+                if status.strip()
+            ]
             if 'ALL' in statuses:
-                available_statuses = await self.get_available_statuses()
                 return [status for status in available_statuses if status != 'ALL']
             return statuses
 
-        available_statuses = await self.get_available_statuses()
+        available_statuses = self.get_available_statuses(pr_statuses)
         if not available_statuses:
             console.print("[yellow]No PR statuses found[/yellow]")
             return []
 
+        import inquirer
+
         questions = [
             inquirer.Checkbox(
                 'statuses',
@@ -164,26 +374,32 @@ class InlinePRAnalyzer:
         if self.args.sort:
             return self.args.sort
 
+        import inquirer
+
         questions = [inquirer.List('sort', message="Sort by", choices=fields, default='Days Open')]
         answers = inquirer.prompt(questions)
         return answers['sort'] if answers else 'Days Open'
 
-    def display_results(self, data: List[Dict[str, Any]]):
+    def display_results(self, cols: Dict[str, List[Any]]):
+        columns = list(cols.keys())
+        rows = zip(*cols.values())
+
         if self.args.output == 'json':
-            console.print_json(data=data)
+            console.print_json(data=[dict(zip(columns, row)) for row in rows])
             return
 
         table = Table(show_header=True, header_style="bold magenta")
 
-        if not data:
+        if not cols['PR #']:
             console.print("[red]No PRs found matching criteria[/red]")
             return
 
-        for column in data[0].keys():
+        for column in columns:
             table.add_column(column)
 
-        for row in data:
-            table.add_row(*[str(value) for value in row.values()])
+        add_row = table.add_row
+        for row in rows:
+            add_row(*(v if type(v) is str else str(v) for v in row))
 
         console.print(table)
 
@@ -202,32 +418,36 @@ class InlinePRAnalyzer:
                 console.print(f"[yellow]No PRs found for user {user}[/yellow]")
                 return
 
-            statuses = await self.get_status_selection()
-            if not statuses:
-                return
-
             with Progress(disable=self.args.no_progress, transient=True) as progress:
                 details_task = progress.add_task("[cyan]Processing PR details...", total=len(prs))
 
-                batch_size = 3
-                pr_details = []
-
-                for i in range(0, len(prs), batch_size):
-                    batch = prs[i:i+batch_size]
-                    batch_tasks = [self.client.get_pr_details(pr['number']) for pr in batch]
-                    batch_results = await asyncio.gather(*batch_tasks)
-                    pr_details.extend(batch_results)
-
-                    progress.update(details_task, advance=len(batch))
+                summaries = {}
+                async for chunk in self.client.graphql_pr_summary([pr['number'] for pr in prs]):
+                    summaries.update(chunk)
+                    progress.update(details_task, advance=len(chunk))
 
-                    await asyncio.sleep(0.1)
+            pr_summaries = [
+                (pr, summaries[pr['number']]) for pr in prs if pr['number'] in summaries
+            ]
+            pr_statuses = [self.get_pr_statuses(pr, summary) for pr, summary in pr_summaries]
 
-            pr_data = [self.process_pr(pr, details) for pr, details in zip(prs, pr_details)]
+            statuses = set(self.get_status_selection(pr_statuses))
+            if not statuses:
+                return
 
-            if pr_data:
-                sort_by = self.get_sort_selection(list(pr_data[0].keys()))
-                pr_data.sort(key=lambda x: x[sort_by], reverse=True)
-                self.display_results(pr_data)
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            process_pr = self.process_pr
+            cols = {column: [] for column in PR_COLUMNS}
+            for (pr, summary), current in zip(pr_summaries, pr_statuses):
+                if current & statuses:
+                    process_pr(pr, summary, now, cols)
+
+            if cols['PR #']:
+                sort_by = self.get_sort_selection(PR_COLUMNS)
+                values = cols[sort_by]
+                order = sorted(range(len(values)), key=values.__getitem__, reverse=True)
+                cols = {column: [col[i] for i in order] for column, col in cols.items()}
+                self.display_results(cols)
             else:
                 console.print("[yellow]No PRs found matching selected statuses[/yellow]")
 